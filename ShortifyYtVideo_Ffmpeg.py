@@ -1,13 +1,19 @@
 import os
 import re
+import json
+import html
 import logging
 from googleapiclient.discovery import build
 from pytubefix import YouTube
 from dotenv import load_dotenv
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import subprocess
 import textwrap
 from random import shuffle
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # Automatically detect the script directory
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -40,18 +46,138 @@ SHORTIFIED_VIDEOS_DIR = os.path.join(SCRIPT_DIR, 'ShortifiedYtVideos')
 os.makedirs(YT_DOWNLOADS_DIR, exist_ok=True)
 os.makedirs(SHORTIFIED_VIDEOS_DIR, exist_ok=True)
 
+# Number of videos downloaded and merged concurrently
+MAX_DOWNLOAD_WORKERS = 4
+
+# Dimensions of the vertical short, fixed by the filter graph
+SHORT_WIDTH, SHORT_HEIGHT = 720, 1280
+
+# The background is blurred at half resolution, then scaled back up
+BLUR_WIDTH, BLUR_HEIGHT = SHORT_WIDTH // 2, SHORT_HEIGHT // 2
+
+# Stream parameters of outro clips, probed once per run
+OUTRO_STREAM_PARAMS = {}
+
+# Characters stripped from download filenames
+SANITIZE_FILENAME_RE = re.compile(r'\W+')
+
+# Spaces and slashes in titles become underscores in output filenames
+TITLE_FILENAME_TABLE = str.maketrans(' /', '__')
+
+# Wraps titles for the text overlay
+TITLE_WRAPPER = textwrap.TextWrapper(width=20, break_long_words=True, break_on_hyphens=False)
+
+# Characters that must be escaped in a filter graph description
+FILTER_GRAPH_SPECIAL_RE = re.compile(r"[\\'\[\],;]")
+
 # Initialize YouTube API client
 youtube = build('youtube', 'v3', developerKey=API_KEY)
 
+# Shared HTTP session that reuses connections and retries transient server errors
+http_session = requests.Session()
+http_session.mount("https://", HTTPAdapter(
+    pool_maxsize=10,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])
+))
+
+# Common ffmpeg arguments: no banner, only errors on stderr, overwrite outputs
+FFMPEG_BASE = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y']
+
+def run_ffmpeg(cmd, **kwargs):
+    """Run an ffmpeg command with stdout discarded, logging its stderr if it fails."""
+    try:
+        return subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True, **kwargs)
+    except subprocess.CalledProcessError as e:
+        logging.error(f"ffmpeg failed: {e.stderr.strip()}")
+        raise
+
+def probe_video_encoder():
+    """Pick the fastest usable H.264 encoder: NVENC, then AMF, then libx264."""
+    try:
+        result = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        logging.error(f"Failed to list ffmpeg encoders: {e}")
+        return 'libx264'
+
+    for encoder in ('h264_nvenc', 'h264_amf'):
+        if encoder not in result.stdout:
+            continue
+        # Hardware encoders are often compiled in without a usable GPU, so try a one-frame encode
+        cmd_test = [
+            *FFMPEG_BASE,
+            '-f', 'lavfi', '-i', 'color=black:s=256x256',
+            '-frames:v', '1', '-c:v', encoder, '-f', 'null', '-'
+        ]
+        if subprocess.run(cmd_test, capture_output=True).returncode == 0:
+            logging.info(f"Using hardware video encoder {encoder}.")
+            return encoder
+
+    logging.info("No hardware video encoder available, using libx264.")
+    return 'libx264'
+
+# Video encoder probed once per run
+VIDEO_ENCODER = probe_video_encoder()
+
+# Encoder arguments for each supported encoder
+ENCODER_ARGS = {
+    'h264_nvenc': ['-c:v', 'h264_nvenc', '-preset', 'p4', '-tune', 'hq', '-rc', 'vbr', '-cq', '23', '-b:v', '1000k'],
+    'h264_amf': ['-c:v', 'h264_amf', '-quality', 'speed', '-b:v', '1000k'],
+    # Frame threads on every core and a shorter rate control lookahead for the CPU fallback
+    'libx264': ['-c:v', 'libx264', '-b:v', '1000k', '-preset', 'medium', '-threads', '0', '-x264-params', 'rc-lookahead=10'],
+}
+
+# Input arguments to decode on the same GPU as the encoder
+HWACCEL_ARGS = {
+    'h264_nvenc': ['-hwaccel', 'cuda'],
+}
+
+VIDEO_ENCODER_ARGS = ENCODER_ARGS[VIDEO_ENCODER]
+
+# Filter graph of the final render up to the text overlay, which is the only part that changes per video
+FILTER_GRAPH_PREFIX = (
+    "[0:v]split=2[bg_in][fg_in];"
+    # Blurry background filling the whole short
+    f"[bg_in]scale={BLUR_WIDTH}:{BLUR_HEIGHT}:force_original_aspect_ratio=increase,crop={BLUR_WIDTH}:{BLUR_HEIGHT},"
+    f"boxblur=5:5,scale={SHORT_WIDTH}:{SHORT_HEIGHT}[bg];"
+    # Main video fitted inside the background, dimensions divisible by 2
+    f"[fg_in]scale='if(gt(a,{SHORT_WIDTH}/{SHORT_HEIGHT}),{SHORT_WIDTH},-2)':'if(gt(a,{SHORT_WIDTH}/{SHORT_HEIGHT}),-2,{SHORT_HEIGHT})'[fg];"
+    "[bg][fg]overlay=(W-w)/2:(H-h)/2,"
+)
+
+# Same filter graph keeping decoded frames on the GPU. boxblur, crop and drawtext have
+# no CUDA versions, so only those steps download frames to the CPU. boxblur treats NV12's
+# interleaved UV plane as one channel, so the background is blurred as planar yuv420p.
+CUDA_FILTER_GRAPH_PREFIX = (
+    "[0:v]split=2[bg_in][fg_in];"
+    f"[bg_in]scale_cuda='if(gt(a,{BLUR_WIDTH}/{BLUR_HEIGHT}),-2,{BLUR_WIDTH})':'if(gt(a,{BLUR_WIDTH}/{BLUR_HEIGHT}),{BLUR_HEIGHT},-2)',"
+    f"hwdownload,format=nv12,format=yuv420p,crop={BLUR_WIDTH}:{BLUR_HEIGHT},boxblur=5:5,format=nv12,"
+    f"hwupload_cuda,scale_cuda={SHORT_WIDTH}:{SHORT_HEIGHT}[bg];"
+    f"[fg_in]scale_cuda='if(gt(a,{SHORT_WIDTH}/{SHORT_HEIGHT}),{SHORT_WIDTH},-2)':'if(gt(a,{SHORT_WIDTH}/{SHORT_HEIGHT}),-2,{SHORT_HEIGHT})'[fg];"
+    "[bg][fg]overlay_cuda=x=(W-w)/2:y=(H-h)/2,"
+    "hwdownload,format=nv12,"
+)
+
+# (input arguments, filter graph prefix) pairs for the final render, tried in order until one succeeds
+RENDER_PIPELINES = [(HWACCEL_ARGS.get(VIDEO_ENCODER, []), FILTER_GRAPH_PREFIX)]
+if VIDEO_ENCODER == 'h264_nvenc':
+    # Sources NVDEC cannot decode (e.g. AV1 on older GPUs) fall back to the software filter graph
+    RENDER_PIPELINES.insert(0, (['-hwaccel', 'cuda', '-hwaccel_output_format', 'cuda'], CUDA_FILTER_GRAPH_PREFIX))
+
+# Title overlay, formatted per video with values escaped by escape_filter_value
+DRAWTEXT_TEMPLATE = (
+    "drawtext=text={text}:expansion=none:fontfile={fontfile}:fontcolor=white:fontsize=50"
+    ":box=1:boxcolor=black@0.6:boxborderw=10:x=(w-text_w)/2:y=10"
+)
+
 def sanitize_filename(filename):
     """Remove all non-alphanumeric characters from filenames."""
-    return re.sub(r'\W+', '', filename)
+    return SANITIZE_FILENAME_RE.sub('', filename)
     
 def fetch_random_video():
     url = f"https://www.googleapis.com/youtube/v3/search?key={API_KEY}&channelId={CHANNEL_ID}&part=snippet,id&order=date&maxResults=50"
     
     try:
-        response = requests.get(url)
+        response = http_session.get(url, timeout=10)
         response.raise_for_status()  # Raises an HTTPError for bad responses
         data = response.json()
 
@@ -59,53 +185,70 @@ def fetch_random_video():
             logging.error("No videos found or an error occurred in the API response.")
             return None
 
-        video_ids = [item['id']['videoId'] for item in data['items'] if item['id'].get('videoId')]
+        # The search results already carry each title, HTML-escaped
+        videos = [
+            (item['id']['videoId'], html.unescape(item['snippet']['title']))
+            for item in data['items'] if item['id'].get('videoId')
+        ]
         
-        if not video_ids:
+        if not videos:
             logging.warning("No video IDs found in the response.")
             return None
 
-        # Shuffle the video IDs to randomize order
-        shuffle(video_ids)
+        # Shuffle the videos to randomize order
+        shuffle(videos)
 
-        return [f"https://www.youtube.com/watch?v={video_id}" for video_id in video_ids]
+        return videos
 
     except requests.exceptions.RequestException as e:
         logging.error(f"Failed to fetch videos: {e}")
         return None
 
 # Download video using pytube
-def download_video(video_id, title):
+def download_video(yt, title):
+    video_id = yt.video_id
     try:
-        url = f"https://www.youtube.com/watch?v={video_id}"
-        logging.debug(f"Attempting to download video from URL: {url}")
-        
-        yt = YouTube(url)
+        logging.debug(f"Attempting to download video from URL: {yt.watch_url}")
 
         # Check the duration of the video
         duration = yt.length  # Duration in seconds
         if duration < 120:  # 120 seconds = 2 minutes
             logging.info(f"Video '{title}' is shorter than 2 minutes. Skipping download.")
             return
+
+        filename_base = sanitize_filename(title)
+
+        # A progressive stream has audio and video muxed already, so it needs no separate audio download or merge
+        progressive_stream = yt.streams.filter(progressive=True, file_extension='mp4').order_by('resolution').desc().first()
+        if progressive_stream and int(progressive_stream.resolution[:-1]) >= 720:
+            output_path = os.path.join(YT_DOWNLOADS_DIR, f"{filename_base}.mp4")
+            if os.path.exists(output_path):
+                return output_path, None, True
+
+            progressive_stream.download(output_path=YT_DOWNLOADS_DIR, filename=f"{filename_base}.mp4")
+            logging.info(f"Downloaded progressive video for video {video_id}.")
+
+            return output_path, None, False
         
         # Download the highest resolution video stream
-        video_stream = yt.streams.filter(adaptive=True, file_extension='mp4', only_video=True).order_by('resolution').desc().first()
-        audio_stream = yt.streams.filter(adaptive=True, file_extension='mp4', only_audio=True).first()
+        mp4_streams = yt.streams.filter(adaptive=True, file_extension='mp4')
+        video_stream = mp4_streams.filter(only_video=True).order_by('resolution').desc().first()
+        audio_stream = mp4_streams.filter(only_audio=True).first()
         
         if not video_stream or not audio_stream:
             logging.error(f"Could not find suitable video or audio streams for video {video_id}.")
             return None
         
-        video_path = os.path.join(YT_DOWNLOADS_DIR, f"{sanitize_filename(title)}_video.mp4")
-        audio_path = os.path.join(YT_DOWNLOADS_DIR, f"{sanitize_filename(title)}_audio.mp4")
+        video_path = os.path.join(YT_DOWNLOADS_DIR, f"{filename_base}_video.mp4")
+        audio_path = os.path.join(YT_DOWNLOADS_DIR, f"{filename_base}_audio.mp4")
         
         if os.path.exists(video_path):
             return video_path, audio_path, True
         
         # return
         
-        video_stream.download(output_path=YT_DOWNLOADS_DIR, filename=f"{sanitize_filename(title)}_video.mp4")
-        audio_stream.download(output_path=YT_DOWNLOADS_DIR, filename=f"{sanitize_filename(title)}_audio.mp4")
+        video_stream.download(output_path=YT_DOWNLOADS_DIR, filename=f"{filename_base}_video.mp4")
+        audio_stream.download(output_path=YT_DOWNLOADS_DIR, filename=f"{filename_base}_audio.mp4")
         
         logging.info(f"Downloaded video and audio for video {video_id}.")
         
@@ -115,38 +258,123 @@ def download_video(video_id, title):
         return None
     
 def merge_video_audio(video_path, audio_path, output_path):
-    try:
+    # The downloaded audio is already AAC, so try a plain stream copy before re-encoding it
+    for audio_codec in ('copy', 'aac'):
         command = [
-            'ffmpeg', '-y', 
-            '-i', video_path, 
-            '-i', audio_path, 
-            '-c:v', 'copy', 
-            '-c:a', 'aac', 
-            '-strict', 'experimental', 
+            *FFMPEG_BASE,
+            '-i', video_path,
+            '-i', audio_path,
+            '-c:v', 'copy',
+            '-c:a', audio_codec,
+            '-movflags', '+faststart',
             output_path
         ]
-        subprocess.run(command, check=True)
-        logging.info(f"Merged video and audio into {output_path}.")
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Error merging video and audio: {e}")
+        try:
+            run_ffmpeg(command)
+            logging.info(f"Merged video and audio into {output_path}.")
+            return
+        except subprocess.CalledProcessError as e:
+            logging.error(f"Error merging video and audio with audio codec '{audio_codec}': {e}")
 
-def download_and_merge(video_id, title):
-    paths = download_video(video_id, title)
+def download_and_merge(yt, title):
+    paths = download_video(yt, title)
     if paths:
         video_path, audio_path, local = paths
+        if audio_path is None:
+            # Progressive download, audio is already muxed in
+            return video_path
         output_path = os.path.join(YT_DOWNLOADS_DIR, f"{sanitize_filename(title)}.mp4")
         if not local:
             merge_video_audio(video_path, audio_path, output_path)
         return output_path
     return None
 
-def break_text(text, max_lines=3, line_width=40, top_padding=1, bottom_padding=1):
+def probe_stream_params(video_path):
+    """Return the parameters of each stream that must match for the concat demuxer to copy streams."""
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-show_entries', 'stream=codec_type,codec_name,profile,width,height,pix_fmt,r_frame_rate,time_base,sample_rate,channels',
+        '-of', 'json', video_path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        return json.loads(result.stdout).get('streams', [])
+    except (subprocess.CalledProcessError, ValueError) as e:
+        logging.error(f"ffprobe failed for {video_path}: {e}")
+        return None
+
+def prepare_outro(outro_path, final_params):
     """
-    Break text into multiple lines with a maximum number of lines, add ellipsis if the text exceeds,
-    and add space at the top and bottom.
+    Transcode the outro once to match the final video's streams, so the concat demuxer can copy both.
+    The result is cached per source file, encoder, frame rate and audio format, and its path is returned.
+    """
+    # Identify the source by modification time and size, so a replaced outro is transcoded again
+    try:
+        outro_stat = os.stat(outro_path)
+    except OSError as e:
+        logging.error(f"Cannot read outro {outro_path}: {e}")
+        return None
+
+    video_params = next(stream for stream in final_params if stream.get('codec_type') == 'video')
+    audio_params = next((stream for stream in final_params if stream.get('codec_type') == 'audio'), None)
+
+    cache_name = (
+        f"_outro_cache_{outro_stat.st_mtime_ns}_{outro_stat.st_size}"
+        f"_{SHORT_WIDTH}x{SHORT_HEIGHT}_{VIDEO_ENCODER}_{video_params['r_frame_rate'].replace('/', '-')}"
+    )
+    if audio_params:
+        cache_name += f"_{audio_params['sample_rate']}_{audio_params['channels']}"
+    cache_path = os.path.join(SHORTIFIED_VIDEOS_DIR, f"{cache_name}.mp4")
+    if os.path.exists(cache_path):
+        return cache_path
+
+    if outro_path not in OUTRO_STREAM_PARAMS:
+        OUTRO_STREAM_PARAMS[outro_path] = probe_stream_params(outro_path)
+    outro_has_audio = any(stream.get('codec_type') == 'audio' for stream in OUTRO_STREAM_PARAMS[outro_path] or [])
+
+    cmd = [*FFMPEG_BASE, '-i', outro_path]
+    maps = ['-map', '0:v']
+    audio_args = []
+    if audio_params:
+        if not outro_has_audio:
+            # Silent track, so the outro has the same streams as the final video
+            cmd += ['-f', 'lavfi', '-i', f"anullsrc=sample_rate={audio_params['sample_rate']}"]
+        maps += ['-map', '0:a' if outro_has_audio else '1:a']
+        audio_args = ['-c:a', 'aac', '-ar', str(audio_params['sample_rate']), '-ac', str(audio_params['channels']), '-shortest']
+
+    partial_path = f"{cache_path}.part.mp4"
+    cmd += [
+        '-vf', f"scale={SHORT_WIDTH}:{SHORT_HEIGHT}:force_original_aspect_ratio=decrease,"
+               f"pad={SHORT_WIDTH}:{SHORT_HEIGHT}:(ow-iw)/2:(oh-ih)/2,setsar=1",
+        '-r', video_params['r_frame_rate'],
+        *maps, *VIDEO_ENCODER_ARGS, *audio_args,
+        '-movflags', '+faststart',
+        partial_path
+    ]
+    try:
+        run_ffmpeg(cmd)
+        # Only publish the cache once it is complete
+        os.replace(partial_path, cache_path)
+        logging.info(f"Cached outro as {cache_path}.")
+        return cache_path
+    except subprocess.CalledProcessError as e:
+        logging.error(f"Error preparing outro {outro_path}: {e}")
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        return None
+
+def concat_list_entry(path):
+    """Format a path as a concat demuxer list entry, quoting single quotes in the path."""
+    escaped_path = os.path.abspath(path).replace("'", "'\\''")
+    return f"file '{escaped_path}'\n"
+
+def break_text(text, max_lines=3, top_padding=1, bottom_padding=1):
+    """
+    Break text into multiple lines of TITLE_WRAPPER's width with a maximum number of lines,
+    add ellipsis if the text exceeds, and add space at the top and bottom.
     """
     # Wrap the text
-    wrapped_text = textwrap.wrap(text, width=line_width)
+    wrapped_text = TITLE_WRAPPER.wrap(text)
     
     # If the text exceeds the maximum lines, truncate and add an ellipsis
     if len(wrapped_text) > max_lines:
@@ -159,134 +387,121 @@ def break_text(text, max_lines=3, line_width=40, top_padding=1, bottom_padding=1
     # Join the lines back into a single string
     return '\n'.join(padded_text)
 
+def escape_filter_value(value):
+    """
+    Escape a filter option value for use inside a filter graph, so titles and paths
+    may contain quotes, colons, commas and leading or trailing newlines.
+    """
+    # First level: quote the option value, closing the quote around any single quote
+    quoted = "'" + value.replace("'", "'\\''") + "'"
+    # Second level: escape the quoted value for the filter graph parser
+    return FILTER_GRAPH_SPECIAL_RE.sub(lambda match: '\\' + match.group(0), quoted)
+
+def shortified_output_path(sanitized_title):
+    """Return the path of the finished short (with outro) for a title sanitized with TITLE_FILENAME_TABLE."""
+    return os.path.join("ShortifiedYtVideos", f"{sanitized_title}_with_outro.mp4")
+
 def trim_and_resize_video(input_path, title, outro_path, duration=55, watermark_path=None, overwrite = False):
     try:
+        # Sanitize title for filenames
+        sanitized_title = title.translate(TITLE_FILENAME_TABLE)
+
+        # Nothing to do if the finished short already exists
+        concat_output_path = shortified_output_path(sanitized_title)
+        if os.path.exists(concat_output_path) and not overwrite:
+            logging.info(f"Short already exists at {concat_output_path}, skipping processing.")
+            return True
+
         logging.info(f"Starting video processing for: {title}")
 
         # Ensure directories exist
         output_dir = "output_videos"
         os.makedirs(output_dir, exist_ok=True)
-        
-        # Sanitize title for filenames
-        sanitized_title = title.replace(' ', '_').replace('/', '_')
-
-        # Step 1: Create a Blurry Background Video
-        blurry_bg_path = os.path.join(output_dir, f"{sanitized_title}_blurry_bg_9_16.mp4")
-        logging.debug(f"Creating blurry background video at: {blurry_bg_path}")
-
-        # Create blurry background video
-        cmd_trim_resize_blur = [
-            'ffmpeg', '-y', '-i', input_path,
-            '-vf', "scale=-1:1280,crop='min(720,iw)':'min(1280,ih)',boxblur=10:10,pad=720:1280:(ow-iw)/2:(oh-ih)/2",
-            '-c:v', 'libx264', '-b:v', '1000k', '-preset', 'medium', '-an', '-t', str(duration), blurry_bg_path
-        ]
-
-        if not os.path.exists(blurry_bg_path):
-            try:
-                subprocess.run(cmd_trim_resize_blur, check=True)
-                logging.info(f"Blurry background video saved to {blurry_bg_path}")
-            except subprocess.CalledProcessError as e:
-                logging.error(f"Failed to create blurry background video. Error: {e}")
-                return  # Exit if this step fails
-
-        # Helper function to get video dimensions
-        def get_video_dimensions(video_path):
-            cmd = ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'stream=width,height', '-of', 'default=noprint_wrappers=1:nokey=1', video_path]
-            try:
-                result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-                width_height = result.stdout.strip().split('\n')
-                if len(width_height) != 2:
-                    raise ValueError("Unexpected output from ffprobe")
-                width, height = map(int, width_height)
-                return width, height
-            except subprocess.CalledProcessError as e:
-                logging.error(f"ffprobe failed with error: {e}")
-                raise
-            except ValueError as e:
-                logging.error(f"Error parsing video dimensions: {e}")
-                raise
-
-        
-        # Get dimensions of blurry background
-        blurry_width, blurry_height = get_video_dimensions(blurry_bg_path)
-        logging.debug(f"Blurry background dimensions: {blurry_width}x{blurry_height}")
-
-        # Step 2: Trim and Resize Main Video
-        trimmed_main_path = os.path.join(output_dir, f"{sanitized_title}_trimmed_main.mp4")
-        logging.debug(f"Trimming and resizing main video at: {trimmed_main_path}")
-
-        cmd_cut = [
-            'ffmpeg', '-y', '-i', input_path,
-            '-vf', f"scale='if(gt(a,{blurry_width}/{blurry_height}),floor({blurry_width}/2)*2,-2)':'if(gt(a,{blurry_width}/{blurry_height}),-2,floor({blurry_height}/2)*2)'",  # Ensure dimensions are divisible by 2
-            '-c:v', 'libx264', '-b:v', '1000k', '-preset', 'ultrafast',
-            '-t', str(duration),  # Specify duration with the -t option
-            trimmed_main_path
-        ]
 
-        if not os.path.exists(trimmed_main_path):
-            try:
-                subprocess.run(cmd_cut, check=True)
-                logging.info(f"Trimmed main video saved to {trimmed_main_path}")
-            except subprocess.CalledProcessError as e:
-                logging.error(f"Failed to trim main video. Error: {e}")
-                return  # Exit if this step fails
-
-        # Get dimensions of trimmed main video
-        main_width, main_height = get_video_dimensions(trimmed_main_path)
-        logging.debug(f"Trimmed main video dimensions: {main_width}x{main_height}")
-        
         # Define the path to the custom font
         custom_font_path = os.path.join("Fonts", "Luciole-Regular.ttf")
         # Prepare text for overlay
-        formatted_title = break_text(title, max_lines=3, line_width=20, top_padding=3, bottom_padding=3)
+        formatted_title = escape_filter_value(break_text(title, max_lines=3, top_padding=3, bottom_padding=3))
 
-        # Step 3: Overlay Main Clip on Blurry Background and Add Text at the Top
+        # Steps 1-3: Blur the background, fit the main video on top of it and add text at the top.
+        # A single filter graph decodes the input once and encodes once, without intermediate files.
         final_output_path = os.path.join(output_dir, f"{sanitized_title}_final.mp4")
-        # cmd_combine = [
-        #     'ffmpeg', '-y', '-i', blurry_bg_path,
-        #     '-i', trimmed_main_path,
-        #     '-filter_complex', f"[0:v][1:v]overlay=(W-w)/2:(H-h)/2,drawtext=text='{formatted_title}':fontfile={custom_font_path}:fontcolor=white:fontsize=50:box=1:boxcolor=black@0.6:boxborderw=10:x=(w-text_w)/2:y=10",
-        #     '-c:v', 'libx264', '-b:v', '1000k', '-preset', 'medium', final_output_path
-        # ]
-
-        cmd_combine = [
-            'ffmpeg', '-y', '-i', blurry_bg_path,
-            '-i', trimmed_main_path,
-            # '-i', watermark_path,  # Add watermark as an additional input
-            '-filter_complex', (
-                f"[0:v][1:v]overlay=(W-w)/2:(H-h)/2,"  # Overlay main video on background
-                f"drawtext=text='{formatted_title}':fontfile={custom_font_path}:fontcolor=white:fontsize=50:box=1:boxcolor=black@0.6:boxborderw=10:x=(w-text_w)/2:y=10"  # Add text
-                # f"[2:v]scale=50:50[wm];[0:v][wm]overlay=5:H-h-10"  # Add watermark
-            ),
-            '-c:v', 'libx264', '-b:v', '1000k', '-preset', 'medium', final_output_path
-        ]
-
-        if not os.path.exists(final_output_path):
-            try:
-                subprocess.run(cmd_combine, check=True)
-                print(f"Final video with text created and saved to {final_output_path}")
-            except subprocess.CalledProcessError as e:
-                print(f"Final video combination failed. Error: {e}")
-                return  # Exit function if this step fails
+        logging.debug(f"Creating final video at: {final_output_path}")
+
+        drawtext_filter = DRAWTEXT_TEMPLATE.format(text=formatted_title, fontfile=escape_filter_value(custom_font_path))
+
+        if overwrite or not os.path.exists(final_output_path):
+            for input_args, filter_graph_prefix in RENDER_PIPELINES:
+                cmd_combine = [
+                    *FFMPEG_BASE, *input_args,
+                    '-t', str(duration),  # Input option, so demuxing stops after `duration` seconds
+                    '-i', input_path,
+                    '-filter_complex', f"{filter_graph_prefix}{drawtext_filter}[v]",
+                    '-map', '[v]', '-map', '0:a?',
+                    *VIDEO_ENCODER_ARGS,
+                    '-c:a', 'aac',
+                    '-movflags', '+faststart',
+                    final_output_path
+                ]
+                try:
+                    run_ffmpeg(cmd_combine)
+                    print(f"Final video with text created and saved to {final_output_path}")
+                    break
+                except subprocess.CalledProcessError as e:
+                    print(f"Final video combination failed. Error: {e}")
+            else:
+                return  # Exit function if every pipeline fails
 
         # Step 4: Concatenate Final Video with Outro
-        concat_file = os.path.join("concat_list.txt")
-        with open(concat_file, 'w') as f:
-            f.write(f"file '{final_output_path}'\n")
-            f.write(f"file '{outro_path}'\n")
-
-        concat_output_path = os.path.join("ShortifiedYtVideos", f"{sanitized_title}_with_outro.mp4")
-        cmd_concat = [
-            'ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', concat_file,
-            '-c', 'copy', concat_output_path
-        ]
-
-        if not os.path.exists(concat_output_path):
-            try:
-                subprocess.run(cmd_concat, check=True)
-                print(f"Final video with outro created and saved to {concat_output_path}")
-            except subprocess.CalledProcessError as e:
-                print(f"Error while concatenating videos. Error: {e}")
+        # The concat demuxer can only copy streams when the outro matches the final video's stream parameters,
+        # so the outro is transcoded once to match and the cached copy is probed once per run
+        final_params = probe_stream_params(final_output_path)
+        prepared_outro_path = prepare_outro(outro_path, final_params) if final_params else None
+        if prepared_outro_path and prepared_outro_path not in OUTRO_STREAM_PARAMS:
+            OUTRO_STREAM_PARAMS[prepared_outro_path] = probe_stream_params(prepared_outro_path)
+        prepared_outro_params = OUTRO_STREAM_PARAMS.get(prepared_outro_path)
+
+        if prepared_outro_params and prepared_outro_params == final_params:
+            # Feed the concat list through stdin instead of writing it to disk
+            concat_list = concat_list_entry(final_output_path) + concat_list_entry(prepared_outro_path)
+            cmd_concat = [
+                *FFMPEG_BASE, '-fflags', '+genpts',
+                '-f', 'concat', '-safe', '0', '-protocol_whitelist', 'file,pipe', '-i', '-',
+                '-c', 'copy', '-movflags', '+faststart', concat_output_path
+            ]
+        else:
+            logging.debug(f"Outro streams do not match {final_output_path}, re-encoding the concatenation")
+            concat_list = None
+            if outro_path not in OUTRO_STREAM_PARAMS:
+                OUTRO_STREAM_PARAMS[outro_path] = probe_stream_params(outro_path)
+            outro_has_audio = any(stream.get('codec_type') == 'audio' for stream in OUTRO_STREAM_PARAMS[outro_path] or [])
+            concat_filter_graph = (
+                "[0:v]setsar=1[final_v];"
+                f"[1:v]scale={SHORT_WIDTH}:{SHORT_HEIGHT}:force_original_aspect_ratio=decrease,"
+                f"pad={SHORT_WIDTH}:{SHORT_HEIGHT}:(ow-iw)/2:(oh-ih)/2,setsar=1[outro_v];"
+            )
+            if outro_has_audio:
+                concat_filter_graph += "[final_v][0:a][outro_v][1:a]concat=n=2:v=1:a=1[v][a]"
+            else:
+                # Pad the final video's audio with silence to cover the silent outro
+                concat_filter_graph += "[final_v][outro_v]concat=n=2:v=1:a=0[v];[0:a]apad[a]"
+            cmd_concat = [
+                *FFMPEG_BASE,
+                '-fflags', '+genpts', '-i', final_output_path,
+                '-fflags', '+genpts', '-i', outro_path,
+                '-filter_complex', concat_filter_graph,
+                '-map', '[v]', '-map', '[a]',
+                *VIDEO_ENCODER_ARGS,
+                '-c:a', 'aac', '-shortest',
+                '-movflags', '+faststart',
+                concat_output_path
+            ]
+
+        try:
+            run_ffmpeg(cmd_concat, input=concat_list)
+            print(f"Final video with outro created and saved to {concat_output_path}")
+        except subprocess.CalledProcessError as e:
+            print(f"Error while concatenating videos. Error: {e}")
 
         return True
 
@@ -294,22 +509,53 @@ def trim_and_resize_video(input_path, title, outro_path, duration=55, watermark_
         logging.error(f"Error processing video {title}: {e}")
         return
 
+def fetch_and_merge(video_id, title):
+    """Download and merge a video, returning the merged path and title. Runs in a download worker thread."""
+    # Skip the download for videos that have already been shortified
+    if os.path.exists(shortified_output_path(title.translate(TITLE_FILENAME_TABLE))):
+        logging.info(f"Video '{title}' has already been shortified. Skipping download.")
+        return None, title
+
+    yt = YouTube(f"https://www.youtube.com/watch?v={video_id}")
+    return download_and_merge(yt, title), title
+
 def main():
     try:
-        video_urls = fetch_random_video()
-        if not video_urls:
+        videos = fetch_random_video()
+        if not videos:
             raise Exception("No videos to process.")
 
-        for url in video_urls:
-            video_id = url.split('=')[-1]
-            title = YouTube(url).title
-            output_path = download_and_merge(video_id, title)
-            
-            if not output_path:
-                continue
-            outro = os.path.join(SCRIPT_DIR, "Assets/outro.mp4")
-            if (trim_and_resize_video(output_path, title, outro)):
-                break
+        outro = os.path.join(SCRIPT_DIR, "Assets/outro.mp4")
+
+        # Downloads are network-bound, so they run in a thread pool while videos are processed one at a time.
+        # At most MAX_DOWNLOAD_WORKERS are in flight, and a new one is only started once one has been consumed,
+        # so a run that succeeds early does not download videos it never uses.
+        remaining_videos = iter(videos)
+        with ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_WORKERS) as executor:
+            in_flight = {
+                executor.submit(fetch_and_merge, video_id, title)
+                for video_id, title in islice(remaining_videos, MAX_DOWNLOAD_WORKERS)
+            }
+
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        output_path, title = future.result()
+                    except Exception as e:
+                        logging.error(f"Error fetching video: {e}")
+                        output_path = None
+
+                    if output_path and trim_and_resize_video(output_path, title, outro):
+                        # Stop downloads that have not started yet and submit no more
+                        for pending in in_flight:
+                            pending.cancel()
+                        return
+
+                    # Replace the consumed download with the next video, if any
+                    next_video = next(remaining_videos, None)
+                    if next_video:
+                        in_flight.add(executor.submit(fetch_and_merge, *next_video))
 
     except Exception as e:
         logging.error(f"Main execution error: {e}")
@@ -1,17 +1,24 @@
 import os
 import re
+import functools
+import hashlib
 import logging
 from googleapiclient.discovery import build
 from pytubefix import YouTube
-from moviepy.editor import VideoFileClip, ImageClip, TextClip, CompositeVideoClip, concatenate_videoclips
+from moviepy.editor import VideoFileClip, ImageClip, CompositeVideoClip
+from moviepy.config import get_setting
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
 from dotenv import load_dotenv
 import requests
+from requests.adapters import HTTPAdapter
 import subprocess
 import textwrap
+import tempfile
 from random import shuffle
-from PIL import Image, ImageDraw
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageDraw, ImageFont
 import numpy as np
-from skimage.filters import gaussian
+import cv2
 
 # Automatically detect the script directory
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -47,15 +54,60 @@ os.makedirs(SHORTIFIED_VIDEOS_DIR, exist_ok=True)
 # Initialize YouTube API client
 youtube = build('youtube', 'v3', developerKey=API_KEY)
 
+# Shared HTTP session that reuses connections across the API and logo requests
+http_session = requests.Session()
+http_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+# Target resolution for vertical videos
+SHORT_WIDTH, SHORT_HEIGHT = 1080, 1920
+
+# Factor by which frames are downscaled before blurring
+BLUR_DOWNSCALE = 4
+
+# Wraps titles to at most three lines, truncating with an ellipsis
+TITLE_WRAPPER = textwrap.TextWrapper(width=40, max_lines=3, placeholder='...', break_long_words=True)
+
+def probe_video_encoder():
+    """Return 'h264_nvenc' if moviepy's ffmpeg can encode with NVENC, otherwise 'libx264'."""
+    # NVENC is often compiled in without a usable GPU, so try a one-frame encode
+    cmd_test = [
+        get_setting("FFMPEG_BINARY"), '-hide_banner', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', 'color=black:s=256x256',
+        '-frames:v', '1', '-c:v', 'h264_nvenc', '-f', 'null', '-'
+    ]
+    try:
+        if subprocess.run(cmd_test, capture_output=True).returncode == 0:
+            logging.info("Using hardware video encoder h264_nvenc.")
+            return 'h264_nvenc'
+    except OSError as e:
+        logging.error(f"Failed to probe video encoder: {e}")
+
+    logging.info("NVENC not available, using libx264.")
+    return 'libx264'
+
+# Video encoder probed once per run
+VIDEO_ENCODER = probe_video_encoder()
+
+# write_videofile arguments for each supported encoder, encoding at constant quality instead of a fixed bitrate
+WRITE_VIDEOFILE_ARGS = {
+    'h264_nvenc': {'codec': 'h264_nvenc', 'preset': 'p1',
+                   'ffmpeg_params': ['-tune', 'll', '-rc', 'vbr', '-cq', '26', '-b:v', '0', '-movflags', '+faststart', '-pix_fmt', 'yuv420p']},
+    'libx264': {'codec': 'libx264', 'preset': 'veryfast',
+                'ffmpeg_params': ['-crf', '26', '-movflags', '+faststart', '-pix_fmt', 'yuv420p']},
+}
+
+# Characters that are invalid in filenames
+SANITIZE_FILENAME_RE = re.compile(r'[<>:"/\\|?*]')
+
 def sanitize_filename(filename):
     """Remove invalid characters from filenames."""
-    return re.sub(r'[<>:"/\\|?*]', '', filename)
+    return SANITIZE_FILENAME_RE.sub('', filename)
     
 def fetch_random_video():
     url = f"https://www.googleapis.com/youtube/v3/search?key={API_KEY}&channelId={CHANNEL_ID}&part=snippet,id&order=date&maxResults=50"
     
     try:
-        response = requests.get(url)
+        response = http_session.get(url, timeout=10)
         response.raise_for_status()  # Raises an HTTPError for bad responses
         data = response.json()
 
@@ -94,11 +146,18 @@ def download_video(video_id, title):
             logging.error(f"Could not find suitable video or audio streams for video {video_id}.")
             return None
         
-        video_path = os.path.join(YT_DOWNLOADS_DIR, f"{sanitize_filename(title)}_video.mp4")
-        audio_path = os.path.join(YT_DOWNLOADS_DIR, f"{sanitize_filename(title)}_audio.mp4")
+        safe_title = sanitize_filename(title)
+        video_filename = f"{safe_title}_video.mp4"
+        audio_filename = f"{safe_title}_audio.mp4"
+        video_path = os.path.join(YT_DOWNLOADS_DIR, video_filename)
+        audio_path = os.path.join(YT_DOWNLOADS_DIR, audio_filename)
         
-        video_stream.download(output_path=YT_DOWNLOADS_DIR, filename=f"{sanitize_filename(title)}_video.mp4")
-        audio_stream.download(output_path=YT_DOWNLOADS_DIR, filename=f"{sanitize_filename(title)}_audio.mp4")
+        # Download the video and audio streams concurrently
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            video_download = executor.submit(video_stream.download, output_path=YT_DOWNLOADS_DIR, filename=video_filename)
+            audio_download = executor.submit(audio_stream.download, output_path=YT_DOWNLOADS_DIR, filename=audio_filename)
+            video_download.result()
+            audio_download.result()
         
         logging.info(f"Downloaded video and audio for video {video_id}.")
         
@@ -132,33 +191,78 @@ def download_and_merge(video_id, title):
         return output_path
     return None
 
-def break_text(text, max_lines=3, line_width=40):
+def break_text(text):
     """
-    Break text into multiple lines with a maximum number of lines and add ellipsis if the text exceeds.
+    Break text into at most three lines with TITLE_WRAPPER, ending in an ellipsis if the text exceeds.
     """
-    # Wrap the text
-    wrapped_text = textwrap.wrap(text, width=line_width)
-    
-    # If the text exceeds the maximum lines, truncate and add an ellipsis
-    if len(wrapped_text) > max_lines:
-        wrapped_text = wrapped_text[:max_lines]  # Keep only the first `max_lines` lines
-        wrapped_text[-1] += '...'  # Add ellipsis to the last line
-
-    # Join the lines back into a single string
-    return '\n'.join(wrapped_text)
+    return '\n'.join(TITLE_WRAPPER.wrap(text))
 
+@functools.lru_cache(maxsize=32)
 def create_rounded_rectangle(size, radius, color):
-    """Create an image with a rounded rectangle."""
-    img = Image.new('RGBA', size, color)
-    draw = ImageDraw.Draw(img)
-    draw.rectangle([radius, 0, size[0] - radius, size[1]], fill=color)
-    draw.rectangle([0, radius, size[0], size[1] - radius], fill=color)
-    draw.pieslice([0, 0, 2 * radius, 2 * radius], 180, 270, fill=color)
-    draw.pieslice([size[0] - 2 * radius, 0, size[0], 2 * radius], 270, 360, fill=color)
-    draw.pieslice([0, size[1] - 2 * radius, 2 * radius, size[1]], 90, 180, fill=color)
-    draw.pieslice([size[0] - 2 * radius, size[1] - 2 * radius, size[0], size[1]], 0, 90, fill=color)
+    """Create an RGBA array with a rounded rectangle. Results are cached, so the array is read-only."""
+    width, height = size
+    yy, xx = np.ogrid[:height, :width]
+    # Distance of each pixel from the rectangle inset by `radius`; zero outside the corners
+    dx = np.maximum(np.maximum(radius - xx, xx - (width - 1 - radius)), 0)
+    dy = np.maximum(np.maximum(radius - yy, yy - (height - 1 - radius)), 0)
+    img = np.zeros((height, width, 4), dtype=np.uint8)
+    img[dx * dx + dy * dy <= radius * radius] = color
+    img.setflags(write=False)
     return img
 
+def wrap_text_to_width(text, font, max_width, stroke_width=0):
+    """Reflow text into lines no wider than max_width pixels when drawn with font."""
+    lines = []
+    line = ''
+    for word in text.split():
+        candidate = f"{line} {word}" if line else word
+        if line and font.getlength(candidate) + 2 * stroke_width > max_width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    lines.append(line)
+    return '\n'.join(lines)
+
+def render_text_image(text, font_path, fontsize, size, color='white', bg_color=(0, 0, 0, 0), stroke_color='black', stroke_width=0, min_fontsize=20):
+    """
+    Render text centered in an RGBA array of the given size, cached on disk across runs.
+    The text is reflowed to the width of the box, and the font shrinks from fontsize
+    down to min_fontsize until the whole block fits.
+    """
+    render_args = (text, font_path, fontsize, size, color, bg_color, stroke_color, stroke_width, min_fontsize)
+    cache_key = hashlib.sha1(repr(render_args).encode('utf-8')).hexdigest()[:16]
+    cache_file = os.path.join(tempfile.gettempdir(), f"title_{cache_key}.npy")
+    if os.path.exists(cache_file):
+        try:
+            return np.load(cache_file)
+        except (OSError, ValueError, EOFError) as e:
+            # A damaged cache file is a cache miss; it is replaced below
+            logging.warning(f"Ignoring unreadable title cache {cache_file}: {e}")
+
+    img = Image.new('RGBA', size, bg_color)
+    draw = ImageDraw.Draw(img)
+    for fontsize in range(fontsize, min_fontsize - 1, -2):
+        font = ImageFont.truetype(font_path, fontsize)
+        wrapped_text = wrap_text_to_width(text, font, size[0], stroke_width)
+        left, top, right, bottom = draw.multiline_textbbox(
+            (0, 0), wrapped_text, font=font, align='center', stroke_width=stroke_width
+        )
+        if right - left <= size[0] and bottom - top <= size[1]:
+            break
+
+    draw.multiline_text(
+        (size[0] / 2, size[1] / 2), wrapped_text, font=font, fill=color, anchor='mm', align='center',
+        stroke_width=stroke_width, stroke_fill=stroke_color
+    )
+    img_array = np.asarray(img)
+    # Write under a per-process name and only publish the cache once it is complete
+    partial_path = f"{cache_file}.{os.getpid()}.part"
+    with open(partial_path, 'wb') as f:
+        np.save(f, img_array)
+    os.replace(partial_path, cache_file)
+    return img_array
+
 def add_padding_and_radius(title_clip, padding, radius):
     """Add padding and rounded corners to a text clip."""
     # Create an image with rounded rectangle
@@ -167,7 +271,7 @@ def add_padding_and_radius(title_clip, padding, radius):
     background_img = create_rounded_rectangle(padded_size, radius, color=(0, 0, 0, 250))  # Semi-transparent black background
     
     # Convert to moviepy clip
-    background_clip = ImageClip(np.array(background_img), ismask=False).set_duration(title_clip.duration)
+    background_clip = ImageClip(background_img, ismask=False).set_duration(title_clip.duration)
     
     # Place text clip over the background
     title_clip = title_clip.set_position(("center", "center"))
@@ -175,24 +279,136 @@ def add_padding_and_radius(title_clip, padding, radius):
 
 def blur(image, sigma=10):
     """ Returns a blurred version of the image with adjustable blur strength """
-    return gaussian(image.astype(float), sigma=sigma)
+    # Blur a downscaled copy with a proportionally smaller sigma, then scale it back up.
+    # The blur removes the detail lost by downscaling, so the result looks the same.
+    height, width = image.shape[:2]
+    small = cv2.resize(image, None, fx=1 / BLUR_DOWNSCALE, fy=1 / BLUR_DOWNSCALE, interpolation=cv2.INTER_AREA)
+    small_sigma = sigma / BLUR_DOWNSCALE
+    # Three box blurs approximate a Gaussian; each pass costs the same for any kernel size.
+    # An odd box width of about sqrt(4 * sigma^2 + 1) gives the requested sigma after three passes.
+    box_size = int(round(np.sqrt(4 * small_sigma ** 2 + 1))) | 1
+    for _ in range(3):
+        small = cv2.boxFilter(small, -1, (box_size, box_size), borderType=cv2.BORDER_REPLICATE)
+    return cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+
+@functools.lru_cache(maxsize=8)
+def short_layout(original_size):
+    """
+    Return the foreground size and the background crop box (x, y, width, height) for a source size.
+    Nearly all sources share a size, usually 1920x1080, so the result is cached.
+    """
+    original_width, original_height = original_size
+
+    # Fit within the target dimensions, keeping the aspect ratio and at most 720 pixels high
+    scale_factor = min(SHORT_WIDTH / original_width, SHORT_HEIGHT / original_height, 720 / original_height)
+    foreground_size = (int(original_width * scale_factor), int(original_height * scale_factor))
+
+    # Crop the center to the target aspect ratio for the background
+    crop_width = int(min(original_width, original_height * SHORT_WIDTH / SHORT_HEIGHT))
+    crop_height = int(min(original_height, original_width * SHORT_HEIGHT / SHORT_WIDTH))
+    crop_box = ((original_width - crop_width) // 2, (original_height - crop_height) // 2, crop_width, crop_height)
+    return foreground_size, crop_box
+
+def prepare_outro(outro_path):
+    """
+    Transcode the outro to the short's size, frame rate and codecs once, so it can be stream-copied
+    onto every short, and return the cached file's path. The cache is kept per source file and encoder.
+    """
+    # Identify the source by modification time and size, so a replaced outro is transcoded again
+    try:
+        outro_stat = os.stat(outro_path)
+    except OSError as e:
+        logging.error(f"Cannot read outro {outro_path}: {e}")
+        return None
+    cache_path = os.path.join(
+        SHORTIFIED_VIDEOS_DIR,
+        f"_outro_cache_{outro_stat.st_mtime_ns}_{outro_stat.st_size}_{SHORT_WIDTH}x{SHORT_HEIGHT}_{VIDEO_ENCODER}.mp4"
+    )
+    if os.path.exists(cache_path):
+        return cache_path
+
+    # Use silence for outros without audio, so the cached file has the same streams as the main part
+    audio_map = '0:a' if ffmpeg_parse_infos(outro_path)['audio_found'] else '1:a'
+    encoder_args = WRITE_VIDEOFILE_ARGS[VIDEO_ENCODER]
+    partial_path = f"{cache_path}.part.mp4"
+    command = [
+        get_setting("FFMPEG_BINARY"), '-hide_banner', '-loglevel', 'error', '-y',
+        '-i', outro_path,
+        '-f', 'lavfi', '-i', 'anullsrc=channel_layout=stereo:sample_rate=44100',
+        '-map', '0:v', '-map', audio_map,
+        '-vf', f"scale={SHORT_WIDTH}:{SHORT_HEIGHT}:force_original_aspect_ratio=decrease,"
+               f"pad={SHORT_WIDTH}:{SHORT_HEIGHT}:(ow-iw)/2:(oh-ih)/2,setsar=1",
+        '-r', '30', '-t', '5',
+        '-c:v', encoder_args['codec'], '-preset', encoder_args['preset'], *encoder_args.get('ffmpeg_params', []),
+        '-c:a', 'aac', '-ar', '44100', '-ac', '2',
+        partial_path
+    ]
+    try:
+        subprocess.run(command, check=True)
+        # Only publish the cache once it is complete
+        os.replace(partial_path, cache_path)
+        logging.info(f"Cached outro as {cache_path}.")
+        return cache_path
+    except subprocess.CalledProcessError as e:
+        logging.error(f"Error preparing outro {outro_path}: {e}")
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        return None
+
+def concat_videos(first_path, second_path, output_path, work_dir):
+    """
+    Join two videos, stream-copying with the concat demuxer and re-encoding with the concat filter otherwise.
+    The concat demuxer writes a broken file instead of failing when the streams differ, and only the size,
+    frame rate and audio are compared here, so the copy assumes both files come from identical encoder
+    settings, as prepare_outro's output and the main part written with WRITE_VIDEOFILE_ARGS do.
+    """
+    ffmpeg_binary = get_setting("FFMPEG_BINARY")
+    first_infos, second_infos = ffmpeg_parse_infos(first_path), ffmpeg_parse_infos(second_path)
+    stream_keys = ('video_size', 'video_fps', 'audio_found', 'audio_fps')
+    if all(first_infos.get(key) == second_infos.get(key) for key in stream_keys):
+        list_path = os.path.join(work_dir, 'concat_list.txt')
+        with open(list_path, 'w', encoding='utf-8') as f:
+            for path in (first_path, second_path):
+                escaped_path = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped_path}'\n")
+
+        cmd_copy = [
+            ffmpeg_binary, '-hide_banner', '-loglevel', 'error', '-y',
+            '-f', 'concat', '-safe', '0', '-i', list_path,
+            '-c', 'copy', '-movflags', '+faststart', output_path
+        ]
+        try:
+            subprocess.run(cmd_copy, check=True)
+            return
+        except subprocess.CalledProcessError as e:
+            logging.warning(f"Stream copy concat failed, re-encoding with the concat filter: {e}")
+    else:
+        logging.warning(f"Streams of {first_path} and {second_path} differ, re-encoding with the concat filter.")
+
+    encoder_args = WRITE_VIDEOFILE_ARGS[VIDEO_ENCODER]
+    cmd_reencode = [
+        ffmpeg_binary, '-hide_banner', '-loglevel', 'error', '-y',
+        '-i', first_path, '-i', second_path,
+        '-filter_complex', '[0:v][0:a][1:v][1:a]concat=n=2:v=1:a=1[v][a]', '-map', '[v]', '-map', '[a]',
+        '-c:v', encoder_args['codec'], '-preset', encoder_args['preset'], *encoder_args.get('ffmpeg_params', []),
+        '-c:a', 'aac', '-movflags', '+faststart', output_path
+    ]
+    subprocess.run(cmd_reencode, check=True)
 
 def trim_and_resize_video(input_path, title, outro_path, duration=55, watermark_path=None):
+    """Build the short from input_path and append the outro, which must come from prepare_outro."""
     try:
-        # Load the main video and outro video
+        # Load the main video; it is the only decoder for the input file
         clip = VideoFileClip(input_path)
-        clip2 = VideoFileClip(input_path)
-        outro_clip = VideoFileClip(outro_path)
 
         print(f"Original video duration: {clip.duration} seconds")
         print(f"Original video size: {clip.size}")
 
         # Trim the main video to 55 seconds
         clip = clip.subclip(0, duration)
-        clip2 = clip2.subclip(0, duration)
 
         # Define the target size and minimum resolution
-        target_size = (1080, 1920)  # Target resolution for vertical videos
+        target_size = (SHORT_WIDTH, SHORT_HEIGHT)
         min_resolution = (360, 640)  # Define a minimum resolution
 
         # Handle very small resolutions
@@ -200,54 +416,38 @@ def trim_and_resize_video(input_path, title, outro_path, duration=55, watermark_
         if original_size[0] < min_resolution[0] or original_size[1] < min_resolution[1]:
             logging.warning(f"Original video resolution {original_size} is too small. Skipping resizing.")
             output_path = os.path.join(SHORTIFIED_VIDEOS_DIR, f"{sanitize_filename(title)}_short.mp4")
-            clip.write_videofile(output_path, codec="libx264", audio_codec="aac", fps=30)
+            clip.write_videofile(output_path, audio_codec="aac", fps=30, threads=os.cpu_count(), logger=None,
+                                 **WRITE_VIDEOFILE_ARGS[VIDEO_ENCODER])
         else:
-            # Calculate scale factor to fit the video within the target dimensions
-            original_width, original_height = clip.size
-            target_width, target_height = target_size
-
-            # Resize to fit within target dimensions
-            scale_factor = min(target_width / original_width, target_height / original_height)
-            new_width = int(original_width * scale_factor)
-            new_height = int(original_height * scale_factor)
-
-            # Create a blurry background
-            blurred_clip = clip2.fl_image( blur )
-            # If the resized blurred clip is wider than the target width, crop it from the center
-            if blurred_clip.size[0] > target_width:
-                # Calculate the left margin to crop
-                crop_x_center = (blurred_clip.size[0] - target_width) // 2
-                blurred_clip = blurred_clip.crop(x1=crop_x_center, y1=0, x2=crop_x_center + target_width, y2=target_height)
-            # else:
-            #     # If it is narrower, center it
-            #     blurred_clip = blurred_clip.set_position(("center", "center"))
-
-            # Resize while keeping the aspect ratio
-            clip_resized = clip.resize(newsize=(new_width, new_height))
-
-            # If resolution is higher than 720p, resize it down to 720p
-            if clip_resized.size[1] > 720:
-                clip_resized = clip_resized.resize(height=720)
+            target_width = target_size[0]
+            foreground_size, (crop_x, crop_y, crop_width, crop_height) = short_layout(tuple(original_size))
+
+            # Create a blurry background from a single frame in the middle of the clip, instead of
+            # blurring every frame. Crop the center to the target aspect ratio and resize it first.
+            background_frame = clip.get_frame(clip.duration / 2)[crop_y:crop_y + crop_height, crop_x:crop_x + crop_width]
+            background_frame = cv2.resize(background_frame, target_size, interpolation=cv2.INTER_LINEAR)
+            blurred_clip = ImageClip(blur(background_frame)).set_duration(clip.duration)
+
+            # Resize once, straight to the final foreground size
+            clip_resized = clip.resize(newsize=foreground_size)
 
             # Break the title text to fit within three lines
-            wrapped_title = break_text(title, max_lines=3, line_width=40)
+            wrapped_title = break_text(title)
 
             # Define the path to the custom font
             custom_font_path = os.path.join(SCRIPT_DIR, "Fonts/Luciole-Regular.ttf")
 
-            # Create text clip for title
-            title_clip = TextClip(
+            # Create text clip for title, rendered once with PIL instead of an ImageMagick subprocess
+            title_clip = ImageClip(render_text_image(
                 wrapped_title,
+                custom_font_path,  # Path to the custom font file
                 fontsize=70,  # Increase fontsize for better visibility
+                size=(target_width, 200),  # Size of the text box
                 color='white',  # Text color
-                bg_color='rgba(0, 0, 0, 0.6)',  # Semi-transparent background color
-                font=custom_font_path,  # Path to the custom font file
+                bg_color=(0, 0, 0, 153),  # Semi-transparent background color
                 stroke_color='black',  # Outline color
-                stroke_width=2,  # Outline width
-                size=(target_width, 200),  # Size of the text box
-                method='caption',  # Use caption method to handle line breaks
-                align='center'  # Center align text
-            )
+                stroke_width=2  # Outline width
+            ))
 
             # Add padding and border radius
             padding = 20
@@ -261,7 +461,7 @@ def trim_and_resize_video(input_path, title, outro_path, duration=55, watermark_
 
 
             # Overlay the title text on top of the padded video
-            final_clip = CompositeVideoClip([blurred_clip_added, clip_padded, title_clip])
+            layers = [blurred_clip_added, clip_padded, title_clip]
 
             # Add watermark if provided
             if watermark_path:
@@ -271,31 +471,19 @@ def trim_and_resize_video(input_path, title, outro_path, duration=55, watermark_
                              .set_duration(55)  # Duration is 55 seconds
                              .set_position(("right", "bottom"))  # Position the watermark
                              .set_opacity(0.5))  # Adjust opacity as needed
+                layers.append(watermark)
 
-                final_clip = CompositeVideoClip([final_clip, watermark])
+            # Compose all layers in a single pass per frame
+            final_clip = CompositeVideoClip(layers, size=target_size)
 
-            # Resize the outro clip to fit within the target dimensions and center it
-            outro_width, outro_height = outro_clip.size
-            scale_factor_outro = min(target_width / outro_width, target_height / outro_height)
-            new_outro_width = int(outro_width * scale_factor_outro)
-            new_outro_height = int(outro_height * scale_factor_outro)
-
-            # Resize and pad the outro clip to match the target size
-            outro_clip_resized = outro_clip.resize(newsize=(new_outro_width, new_outro_height))
-            x_pad_outro = (target_width - outro_clip_resized.size[0]) // 2
-            y_pad_outro = (target_height - outro_clip_resized.size[1]) // 2
-            outro_clip_centered = outro_clip_resized.set_position((x_pad_outro, y_pad_outro))
-
-            # Overlay outro clip over a blurred background as well
-            # blurred_outro_background = create_blurry_background(outro_clip, target_size)
-            outro_clip_centered = CompositeVideoClip([outro_clip_centered.set_duration(5)])
-
-            # Concatenate the final video with the centered outro
-            combined_clip = concatenate_videoclips([final_clip, outro_clip_centered], method="compose")
-
-            # Save the combined video
+            # Encode the main part with the same settings as the cached outro, then join
+            # them with ffmpeg's concat demuxer instead of recompositing the whole timeline
             output_path = os.path.join(SHORTIFIED_VIDEOS_DIR, f"{sanitize_filename(title)}_short_with_outro.mp4")
-            combined_clip.write_videofile(output_path, codec="libx264", audio_codec="aac", fps=30, bitrate="500k")
+            with tempfile.TemporaryDirectory(dir=SHORTIFIED_VIDEOS_DIR) as work_dir:
+                main_part_path = os.path.join(work_dir, 'main.mp4')
+                final_clip.write_videofile(main_part_path, audio_codec="aac", fps=30, threads=os.cpu_count(), logger=None,
+                                           **WRITE_VIDEOFILE_ARGS[VIDEO_ENCODER])
+                concat_videos(main_part_path, outro_path, output_path, work_dir)
         
         logging.info(f"Video processed and saved as {output_path}.")
     except Exception as e:
@@ -305,7 +493,7 @@ def fetch_channel_logo():
     try:
         # Fetch channel details
         url = f"https://www.googleapis.com/youtube/v3/channels?part=snippet&id={CHANNEL_ID}&key={API_KEY}"
-        response = requests.get(url)
+        response = http_session.get(url, timeout=10)
         response.raise_for_status()
         data = response.json()
 
@@ -326,7 +514,7 @@ def fetch_channel_logo():
 
 def download_logo(logo_url, save_path):
     try:
-        response = requests.get(logo_url)
+        response = http_session.get(logo_url, timeout=10)
         response.raise_for_status()  # Check for HTTP errors
         with open(save_path, 'wb') as file:
             file.write(response.content)
@@ -349,6 +537,12 @@ def main_flow():
             print("Failed to fetch channel logo.")
             return
 
+    # Transcode the outro once; later runs reuse the cached file
+    outro_path = prepare_outro(os.path.join(SCRIPT_DIR, 'Assets/outro.mp4'))
+    if not outro_path:
+        print("Failed to prepare outro.")
+        return
+
     while trials < max_trials:
         video_urls = fetch_random_video()
         if video_urls:
@@ -363,7 +557,7 @@ def main_flow():
             
             # Check if download was successful before proceeding
             if download_path and os.path.exists(download_path):
-                trim_and_resize_video(download_path, video_title+video_id, watermark_path=logo_path)
+                trim_and_resize_video(download_path, video_title+video_id, outro_path, watermark_path=logo_path)
                 break  # Exit loop if successful
             else:
                 logging.error(f"Failed to download video {video_id}, trying next video.")
@@ -379,6 +573,6 @@ if __name__ == "__main__":
     main_flow()
 
     # test local file
-    # trim_and_resize_video(os.path.join(SCRIPT_DIR, r"YtDownloads/httpswww.youtube.comwatchv=JK-B-CT34EU.mp4"), "24 Modern Ui Python, PySide6, Pyqt6 Desktop GUI appJK-B-CT34EU", os.path.join(SCRIPT_DIR, r"Assets/outro.mp4"), watermark_path=logo_path)
+    # trim_and_resize_video(os.path.join(SCRIPT_DIR, r"YtDownloads/httpswww.youtube.comwatchv=JK-B-CT34EU.mp4"), "24 Modern Ui Python, PySide6, Pyqt6 Desktop GUI appJK-B-CT34EU", prepare_outro(os.path.join(SCRIPT_DIR, r"Assets/outro.mp4")), watermark_path=logo_path)
 
 